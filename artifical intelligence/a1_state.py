@@ -12,6 +12,7 @@ State class for the Hinger game
 
 from collections import deque
 from copy import deepcopy
+from functools import lru_cache
 from itertools import count
 
 
@@ -74,7 +75,52 @@ class State:
                     regions += 1
         return regions
 
-       
+    def region_cells(self):
+        """
+        Returns the active regions as lists of (r, c) cells.
+        """
+        seen = set()
+        regions = []
+        for r in range(self.rows):
+            for c in range(self.cols):
+                if self.grid[r][c] > 0 and (r, c) not in seen:
+                    seen.add((r, c))
+                    cells = [(r, c)]
+                    queue = deque(cells)
+                    while queue:
+                        cr, cc = queue.popleft()
+                        for dr, dc in self.directions():
+                            nr, nc = cr+dr, cc+dc
+                            if 0 <= nr < self.rows and 0 <= nc < self.cols:
+                                if self.grid[nr][nc] > 0 and (nr, nc) not in seen:
+                                    seen.add((nr, nc))
+                                    cells.append((nr, nc))
+                                    queue.append((nr, nc))
+                    regions.append(cells)
+        return regions
+
+    def crop(self, cells):
+        """
+        Returns ((row_offset, col_offset), State) holding only the given cells,
+        cropped to their bounding box. Other cells inside the box are zeroed.
+        """
+        top = min(r for r, _ in cells)
+        left = min(c for _, c in cells)
+        height = max(r for r, _ in cells) - top + 1
+        width = max(c for _, c in cells) - left + 1
+        grid = [[0]*width for _ in range(height)]
+        for r, c in cells:
+            grid[r-top][c-left] = self.grid[r][c]
+        return (top, left), State(grid)
+
+    def regions(self):
+        """
+        Splits the board into one cropped subgame per active region.
+        Moves in one region never change hinger status in another.
+        Returns a list of ((row_offset, col_offset), State).
+        """
+        return [self.crop(cells) for cells in self.region_cells()]
+
     def numHingers(self):
         """
         Returns the number of hingers.
@@ -82,6 +128,13 @@ class State:
         and when a move is made on a hinger (i.e., the last counter is removed from this cell), the
         cell becomes empty and the number of active regions on the board increases by one or
         more.
+        Counted per region, with results cached by canonical sub-grid.
+        """
+        return sum(region_hingers(canonical_key(sub.grid)) for _, sub in self.regions())
+
+    def count_hingers(self):
+        """
+        Counts hingers over the whole board without splitting into regions.
         """
         base_regions = self.numRegions()
         count = 0
@@ -134,6 +187,26 @@ class State:
         """
         return all(cell in (0,1) for row in self.grid for cell in row)
 
+def canonical_key(grid):
+    """
+    Key shared by a grid and its rotations/reflections, which all have
+    the same regions and hingers.
+    """
+    variants = []
+    g = [list(row) for row in grid]
+    for _ in range(4):
+        g = [list(row) for row in zip(*g[::-1])]
+        variants.append(tuple(tuple(row) for row in g))
+        variants.append(tuple(tuple(row[::-1]) for row in g))
+    return min(variants)
+
+
+@lru_cache(maxsize=65536)
+def region_hingers(key):
+    """Number of hingers in a single-region sub-grid (cached by canonical_key)."""
+    return State([list(row) for row in key]).count_hingers()
+
+
 def tester():
         """
         Tester for the Hinger state.
@@ -154,6 +227,11 @@ def tester():
         print("\nNumber of active regions:", sa.numRegions())
         print("Number of hinger cells:", sa.numHingers())
 
+        print("\nRegions of State A:")
+        for offset, sub in sa.regions():
+            print(f"Offset {offset}, hingers {sub.numHingers()}:")
+            print(sub)
+
         print("\nPossible moves from State A:")
         for new_state, pos, cost in sa.moves():
             print(f"Move at {pos} (cost {cost}):")
@@ -8,8 +8,12 @@ Student IDs:
 """
 
 from a1_state import State
+from collections import OrderedDict
 from copy import deepcopy
+from itertools import count
 import heapq
+import threading
+import time
 
 """
 
@@ -46,12 +50,137 @@ def path_cost(path):
         total += move_cost_between(path[i], path[i + 1])
     return total
 
+
+"""
+
+Deadlines and cancellation
+
+"""
+FOUND = 'found'
+EXHAUSTED = 'exhausted'
+TIMED_OUT = 'timed_out'
+CANCELLED = 'cancelled'
+LIMIT = 'limit'  # stopped by a DFS limit / IDDFS max_depth, not exhausted
+
+
+class CancelToken:
+    """Thread-safe flag a caller can set to stop a running search."""
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+
+class SearchStopped(Exception):
+    """Raised inside a search when its budget runs out."""
+    def __init__(self, status):
+        super().__init__(status)
+        self.status = status
+
+
+class SearchBudget:
+    """
+    Bounds a search by a deadline (time.monotonic() value) and/or a CancelToken.
+    The clock and token are checked every check_every expansions and before
+    every child safety check, since one expansion can run is_safe on dozens of
+    children. Also records the closest state to the goal seen so far, and
+    whether a depth/step limit cut the search short (cutoff).
+    """
+    def __init__(self, deadline=None, cancel=None, check_every=64):
+        self.deadline = deadline
+        self.cancel = cancel
+        self.check_every = check_every
+        self.expanded = 0
+        self.best = None
+        self.best_distance = float('inf')
+        self.cutoff = False
+
+    def check(self):
+        if self.cancel is not None and self.cancel.cancelled:
+            raise SearchStopped(CANCELLED)
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise SearchStopped(TIMED_OUT)
+
+    def safe(self, state):
+        """is_safe(state), after checking the deadline and token."""
+        self.check()
+        return is_safe(state)
+
+    def expand(self, state, end, progress):
+        """
+        Counts one expansion of state. progress is the partial path/moves to it,
+        or a callable building them, which is only called on improvement.
+        """
+        self.expanded += 1
+        if self.expanded % self.check_every == 0:
+            self.check()
+        distance = counter_distance(state, end)
+        if distance < self.best_distance:
+            self.best_distance = distance
+            self.best = list(progress() if callable(progress) else progress)
+
+
+class SearchResult:
+    """
+    Outcome of a bounded search.
+    status is FOUND, EXHAUSTED, LIMIT, TIMED_OUT or CANCELLED; path is only set when
+    FOUND, otherwise best holds the partial path/moves closest to the goal.
+    """
+    def __init__(self, status, path, budget, elapsed):
+        self.status = status
+        self.path = path
+        self.best = path if status == FOUND else budget.best
+        self.best_distance = 0 if status == FOUND else budget.best_distance
+        self.expanded = budget.expanded
+        self.elapsed = elapsed
+
+    def __str__(self):
+        return (f"{self.status} | expanded: {self.expanded} | "
+                f"elapsed: {self.elapsed:.3f}s | best distance: {self.best_distance}")
+
+
+def counter_distance(state, end):
+    """Number of counters that differ between state and end."""
+    return sum(abs(a - b) for row, end_row in zip(state.grid, end.grid)
+               for a, b in zip(row, end_row))
+
+
+def bounded_search(search, start, end, timeout=None, deadline=None, cancel=None,
+                   check_every=64, **kwargs):
+    """
+    Runs one of the path searches below under a deadline and/or cancellation
+    token and returns a SearchResult instead of a bare path.
+    timeout is in seconds from now; deadline is an absolute time.monotonic().
+    """
+    started = time.monotonic()
+    if timeout is not None:
+        limit = started + timeout
+        deadline = limit if deadline is None else min(deadline, limit)
+    budget = SearchBudget(deadline, cancel, check_every)
+    try:
+        budget.check()
+        path = search(start, end, budget=budget, **kwargs)
+    except SearchStopped as stop:
+        return SearchResult(stop.status, None, budget, time.monotonic() - started)
+    if path is not None:
+        status = FOUND
+    else:
+        status = LIMIT if budget.cutoff else EXHAUSTED
+    return SearchResult(status, path, budget, time.monotonic() - started)
+
+
 """
 Breadth-First Search
 Uses a queue to explore states level by level.
 Stops when the end state is found.
 """
-def path_BFS(start, end):
+def path_BFS(start, end, budget=None):
+    budget = budget or SearchBudget()
     if not is_safe(start) or not is_safe(end):
         return None
     if states_equal(start, end):
@@ -62,9 +191,10 @@ def path_BFS(start, end):
 
     while frontier:
         current, path = frontier.pop(0)
+        budget.expand(current, end, path)
         for next_state, pos, cost in current.moves():
             key = grid_to_key(next_state.grid)
-            if key in visited or not is_safe(next_state):
+            if key in visited or not budget.safe(next_state):
                 continue
             visited.add(key)
             new_path = path + [next_state]
@@ -79,7 +209,8 @@ Uses a stack to explore states deeply before backtracking.
 Uses a limit to avoid infinite loops.
 
 """
-def path_DFS(start, end, limit=100):
+def path_DFS(start, end, limit=100, budget=None):
+    budget = budget or SearchBudget()
     if not is_safe(start) or not is_safe(end):
         return None
     if states_equal(start, end):
@@ -93,10 +224,12 @@ def path_DFS(start, end, limit=100):
         current, path = stack.pop()
         steps += 1
         if steps > limit:
+            budget.cutoff = True
             return None
+        budget.expand(current, end, path)
         for next_state, pos, cost in current.moves():
             key = grid_to_key(next_state.grid)
-            if key in visited or not is_safe(next_state):
+            if key in visited or not budget.safe(next_state):
                 continue
             visited.add(key)
             new_path = path + [next_state]
@@ -109,24 +242,27 @@ def path_DFS(start, end, limit=100):
 # =====================================================
 # Iterative Deepening DFS
 # =====================================================
-def _limited_dfs(current, end, depth, visited):
+def _limited_dfs(current, end, depth, visited, budget, path):
+    budget.expand(current, end, path)
     if states_equal(current, end):
         return [current]
     if depth == 0:
+        budget.cutoff = True
         return None
     for next_state, pos, cost in current.moves():
         key = grid_to_key(next_state.grid)
-        if key in visited or not is_safe(next_state):
+        if key in visited or not budget.safe(next_state):
             continue
         visited.add(key)
-        result = _limited_dfs(next_state, end, depth - 1, visited)
+        result = _limited_dfs(next_state, end, depth - 1, visited, budget, path + [next_state])
         visited.remove(key)
         if result:
             return [current] + result
     return None
 
 
-def path_IDDFS(start, end, max_depth=20):
+def path_IDDFS(start, end, max_depth=20, budget=None):
+    budget = budget or SearchBudget()
     if not is_safe(start) or not is_safe(end):
         return None
     if states_equal(start, end):
@@ -134,9 +270,12 @@ def path_IDDFS(start, end, max_depth=20):
 
     for depth in range(1, max_depth + 1):
         visited = {grid_to_key(start.grid)}
-        result = _limited_dfs(start, end, depth, visited)
+        budget.cutoff = False
+        result = _limited_dfs(start, end, depth, visited, budget, [start])
         if result:
             return result
+        if not budget.cutoff:
+            return None  # nothing left deeper down: the search space is exhausted
     return None
 
 
@@ -160,77 +299,212 @@ def manhattan_heuristic(start, end):
     return total
 
 
-def path_astar(start, end):
+def removal_heuristic(start, end):
+    """
+    Lower bound on the cost from start to end. Cells active in end stay active
+    along any path, so every counter removed at (r, c) costs at least 1 plus
+    the number of neighbours of (r, c) that are active in end. Each move lowers
+    this by no more than its cost, so it is admissible and consistent.
+    """
+    total = 0
+    for r in range(start.rows):
+        for c in range(start.cols):
+            removed = start.grid[r][c] - end.grid[r][c]
+            if removed > 0:
+                total += removed * end.move_cost(r, c)
+    return total
+
+
+def path_astar(start, end, budget=None):
+    """
+    A* search from start to end over safe states.
+    Heap entries are (f, -g, tie, key): equal f-scores prefer the deeper node,
+    and the counter keeps State objects out of the comparison. Uses
+    removal_heuristic, so the path returned is minimal-cost. Stale entries
+    are skipped on pop (lazy deletion) once a key is closed or improved, and a
+    closed key is reopened if a cheaper route to it turns up later.
+    """
+    budget = budget or SearchBudget()
     if not is_safe(start) or not is_safe(end):
         return None
     if states_equal(start, end):
         return [start]
 
-    open_heap = []
+    end_key = grid_to_key(end.grid)
+    tie = count()
+    h_cache = {}
+
+    def h(key, state):
+        if key not in h_cache:
+            h_cache[key] = removal_heuristic(state, end)
+        return h_cache[key]
+
     start_key = grid_to_key(start.grid)
-    heapq.heappush(open_heap, (manhattan_heuristic(start, end), start))
     came_from = {start_key: None}
     g_score = {start_key: 0}
+    states = {start_key: start}
+    closed = set()
+    unsafe = set()
+    open_heap = [(h(start_key, start), 0, next(tie), start_key)]
 
     while open_heap:
-        _, current = heapq.heappop(open_heap)
-        current_key = grid_to_key(current.grid)
+        _, neg_g, _, current_key = heapq.heappop(open_heap)
+        if current_key in closed or -neg_g > g_score[current_key]:
+            continue  # stale entry
+        closed.add(current_key)
+        current = states[current_key]
 
-        if states_equal(current, end):
-            path = []
-            while current_key:
-                prev_state = State([list(r) for r in current_key])
-                path.insert(0, prev_state)
-                current_key = came_from[current_key]
-            return path
+        if current_key == end_key:
+            return _astar_path(current_key, came_from, states)
 
+        budget.expand(current, end, lambda: _astar_path(current_key, came_from, states))
+        current_g = g_score[current_key]
         for next_state, pos, cost in current.moves():
-            if not is_safe(next_state):
-                continue
             key = grid_to_key(next_state.grid)
-            tentative_g = g_score[current_key] + cost
-            if key not in g_score or tentative_g < g_score[key]:
-                came_from[key] = current_key
-                g_score[key] = tentative_g
-                f_score = tentative_g + manhattan_heuristic(next_state, end)
-                heapq.heappush(open_heap, (f_score, next_state))
+            if key in unsafe:
+                continue
+            tentative_g = current_g + cost
+            if key in g_score and tentative_g >= g_score[key]:
+                continue
+            if key not in g_score and not budget.safe(next_state):
+                unsafe.add(key)  # remember so is_safe is not re-run
+                continue
+            closed.discard(key)  # reopen if a cheaper route was found
+            came_from[key] = current_key
+            g_score[key] = tentative_g
+            states[key] = next_state
+            f_score = tentative_g + h(key, next_state)
+            heapq.heappush(open_heap, (f_score, -tentative_g, next(tie), key))
     return None
 
 
+def _astar_path(key, came_from, states):
+    """Walks came_from back from key and returns the list of States."""
+    path = []
+    while key is not None:
+        path.append(states[key])
+        key = came_from[key]
+    path.reverse()
+    return path
+
+
 # =====================================================
 # Minimal Safe Path (returns list of moves)
 # =====================================================
-def min_safe(start, end):
+def min_safe(start, end, budget=None):
     """
     Returns the minimal-cost safe path (list of (r,c) moves).
     Uses Dijkstra-like search, as it guarantees minimal move cost.
     """
+    budget = budget or SearchBudget()
     if not is_safe(start) or not is_safe(end):
         return None
     if states_equal(start, end):
         return []
 
-    import heapq
-    heap = [(0, start, [])]  # cost, state, moves
+    tie = count()
+    heap = [(0, next(tie), start, [])]  # cost, tie, state, moves
     visited = {}
 
     while heap:
-        cost_so_far, current, moves = heapq.heappop(heap)
+        cost_so_far, _, current, moves = heapq.heappop(heap)
         key = grid_to_key(current.grid)
         if key in visited and visited[key] <= cost_so_far:
             continue
         visited[key] = cost_so_far
+        budget.expand(current, end, moves)
 
         if states_equal(current, end):
             return moves
 
         for next_state, pos, move_cost_val in current.moves():
-            if not is_safe(next_state):
+            if not budget.safe(next_state):
                 continue
-            heapq.heappush(heap, (cost_so_far + move_cost_val, next_state, moves + [pos]))
+            heapq.heappush(heap, (cost_so_far + move_cost_val, next(tie), next_state, moves + [pos]))
     return None
 
 
+# =====================================================
+# Region decomposition
+# =====================================================
+def path_moves(path):
+    """Returns the (r, c) moves taken between consecutive States of a path."""
+    moves = []
+    for s1, s2 in zip(path, path[1:]):
+        for r in range(s1.rows):
+            for c in range(s1.cols):
+                if s1.grid[r][c] - s2.grid[r][c] == 1:
+                    moves.append((r, c))
+    return moves
+
+
+# LRU cache of per-region results, bounded like a1_state.region_hingers
+REGION_CACHE_SIZE = 65536
+_region_results = OrderedDict()
+
+
+def by_region(search):
+    """
+    Wraps a path search so it runs separately on each region of start and
+    joins the results.
+    A region can only split by removing a hinger, so along a safe path regions
+    just shrink; each one is an independent subproblem and move costs only
+    depend on cells in the same region. The joined path is therefore optimal
+    whenever search is. Per-region results are kept in a bounded LRU cache
+    keyed by (start, end) sub-grid, together with whether a depth/step limit
+    cut that sub-search short, so a cached result reports the same status.
+    Returns the same shape as search: a list of States, or of moves for min_safe.
+    """
+    returns_moves = search is min_safe
+
+    def regional_search(start, end, budget=None, **kwargs):
+        budget = budget or SearchBudget()
+        if start.rows != end.rows or start.cols != end.cols:
+            return None
+        regions = start.region_cells()
+        covered = {cell for cells in regions for cell in cells}
+        if any(end.grid[r][c] > 0 and (r, c) not in covered
+               for r in range(end.rows) for c in range(end.cols)):
+            return None
+
+        moves = []
+        for cells in regions:
+            (top, left), sub_start = start.crop(cells)
+            _, sub_end = end.crop(cells)
+            key = (search.__name__, grid_to_key(sub_start.grid), grid_to_key(sub_end.grid),
+                   tuple(sorted(kwargs.items())))
+            if key in _region_results:
+                _region_results.move_to_end(key)
+                sub_moves, cutoff = _region_results[key]
+            else:
+                earlier, budget.cutoff = budget.cutoff, False
+                sub_moves = search(sub_start, sub_end, budget=budget, **kwargs)
+                cutoff = budget.cutoff
+                budget.cutoff = earlier
+                if sub_moves is not None and not returns_moves:
+                    sub_moves = path_moves(sub_moves)
+                _region_results[key] = (sub_moves, cutoff)
+                if len(_region_results) > REGION_CACHE_SIZE:
+                    _region_results.popitem(last=False)
+            if cutoff:
+                budget.cutoff = True  # a limit hit, cached or not, still reports LIMIT
+            if sub_moves is None:
+                return None
+            moves.extend((r + top, c + left) for r, c in sub_moves)
+
+        if returns_moves:
+            return moves
+        path = [start]
+        for r, c in moves:
+            next_state = path[-1].clone()
+            next_state.grid[r][c] -= 1
+            path.append(next_state)
+        return path
+
+    regional_search.__name__ = f"{search.__name__}_by_region"
+    return regional_search
+
+
 # =====================================================
 # Compare all algorithms
 # =====================================================
@@ -241,7 +515,9 @@ def compare(start, end):
         ("DFS", path_DFS),
         ("IDDFS", path_IDDFS),
         ("A*", path_astar),
-        ("min_safe", min_safe)
+        ("min_safe", min_safe),
+        ("A* reg", by_region(path_astar)),
+        ("min_reg", by_region(min_safe))
     ]
     print("\nComparison of search algorithms:")
     for name, func in algos:
@@ -249,7 +525,7 @@ def compare(start, end):
         if path is None:
             print(f"{name:8} | Failed to find a path")
         else:
-            if name == "min_safe":
+            if name in ("min_safe", "min_reg"):
                 total = sum(start.move_cost(r, c) for r, c in path)
                 print(f"{name:8} | Success | Moves: {len(path)} | Total cost: {total}")
             else:
@@ -282,6 +558,32 @@ def tester():
 
     compare(start, end)
 
+    print("\nBounded searches (50ms deadline):")
+    big_start = State([[2, 2, 1, 0], [2, 2, 1, 0], [1, 1, 1, 0]])
+    big_end = State([[1, 1, 1, 0], [1, 1, 1, 0], [1, 1, 1, 0]])
+    for name, func in [("BFS", path_BFS), ("A*", path_astar), ("min_safe", min_safe)]:
+        print(f"{name:8} | {bounded_search(func, big_start, big_end, timeout=0.05)}")
+    token = CancelToken()
+    token.cancel()
+    print(f"{'BFS':8} | {bounded_search(path_BFS, big_start, big_end, cancel=token)}")
+
+    print("\nRegion decomposition on separate islands:")
+    islands_start = State([
+        [1, 1, 0, 2, 1, 0, 1, 1],
+        [1, 2, 0, 1, 1, 0, 2, 2],
+    ])
+    islands_end = State([
+        [1, 1, 0, 1, 1, 0, 1, 1],
+        [1, 1, 0, 1, 1, 0, 1, 1],
+    ])
+    moves = by_region(min_safe)(islands_start, islands_end)
+    total = 0
+    current = islands_start.clone()
+    for r, c in moves:
+        total += current.move_cost(r, c)
+        current.grid[r][c] -= 1
+    print(f"min_reg  | Moves: {moves} | Total cost: {total}")
+
 
 if __name__ == "__main__":
     tester()
@@ -0,0 +1,26 @@
+# a2_loader
+"""
+Group ID: B1
+Student ID:
+100464246
+
+Loads a2.path.py, whose file name cannot be imported with a plain import
+statement. Shared by the modules that run a2 searches in worker processes.
+"""
+
+import importlib.util
+import os
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+_paths = None
+
+
+def path_module():
+    """Returns the a2.path module, loading it once per process."""
+    global _paths
+    if _paths is None:
+        spec = importlib.util.spec_from_file_location('a2_path', os.path.join(HERE, 'a2.path.py'))
+        _paths = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(_paths)
+    return _paths
@@ -10,47 +10,235 @@ Integrates multiple strategies: minimax, alphabeta, and MCTS.
 
 import random
 import math
+import time
 from a1_state import State
 import timeit
 
+
+class IncrementalEvaluator:
+    """
+    Carries the features used by Agent.evaluate along with a search.
+    apply() removes one counter from its own copy of the state and updates the
+    totals by delta, undo() reverts the last apply(). score() then matches
+    Agent.evaluate on the current state without rescanning the board.
+
+    Move-cost sum = active cells + 2 * adjacent active pairs, so it changes
+    only by the removed cell's neighbours. Hingers are the cut cells (articulation
+    points) holding one counter; emptying a cell only changes the cut cells of
+    its own region, so only that region is re-analysed.
+
+    Cost per apply/undo: O(1) when the cell keeps a counter, O(size of its
+    region) when the cell is emptied (Tarjan over that region). On a board
+    that is one big region, emptying moves therefore still grow with the board.
+    """
+    def __init__(self, state):
+        self.state = state.clone()
+        self.active = 0
+        self.edges = 0
+        self.regions = 0
+        self.cut = set()
+        self.hingers = 0
+        self.history = []
+        grid = self.state.grid
+        seen = set()
+        for r in range(self.state.rows):
+            for c in range(self.state.cols):
+                if grid[r][c] > 0:
+                    self.active += 1
+                    self.edges += len(self.neighbours(r, c))
+                    if (r, c) not in seen:
+                        cut, cells = self.cut_cells((r, c))
+                        seen.update(cells)
+                        self.cut |= cut
+                        self.regions += 1
+        self.edges //= 2
+        self.hingers = sum(1 for r, c in self.cut if grid[r][c] == 1)
+
+    def neighbours(self, r, c):
+        """Returns the active cells around (r, c)."""
+        grid = self.state.grid
+        result = []
+        for dr, dc in self.state.directions():
+            nr, nc = r+dr, c+dc
+            if 0 <= nr < self.state.rows and 0 <= nc < self.state.cols and grid[nr][nc] > 0:
+                result.append((nr, nc))
+        return result
+
+    def cut_cells(self, root):
+        """
+        Iterative Tarjan over the region containing root.
+        Returns (cut cells of the region, all cells of the region).
+        """
+        disc = {root: 0}
+        low = {root: 0}
+        cut = set()
+        root_children = 0
+        stack = [(root, None, iter(self.neighbours(*root)))]
+        while stack:
+            v, parent, children = stack[-1]
+            for w in children:
+                if w not in disc:
+                    disc[w] = low[w] = len(disc)
+                    stack.append((w, v, iter(self.neighbours(*w))))
+                    if v == root:
+                        root_children += 1
+                    break
+                if w != parent:
+                    low[v] = min(low[v], disc[w])
+            else:
+                stack.pop()
+                if parent is not None:
+                    low[parent] = min(low[parent], low[v])
+                    if parent != root and low[v] >= disc[parent]:
+                        cut.add(parent)
+        if root_children > 1:
+            cut.add(root)
+        return cut, disc.keys()
+
+    def apply(self, move):
+        """Removes one counter at move and returns the updated state."""
+        r, c = move
+        grid = self.state.grid
+        grid[r][c] -= 1
+        if grid[r][c] > 0:
+            # cell stays active: only its own hinger status can change
+            becomes_hinger = grid[r][c] == 1 and move in self.cut
+            self.hingers += becomes_hinger
+            self.history.append((move, becomes_hinger))
+            return self.state
+
+        snapshot = (self.active, self.edges, self.regions, self.hingers)
+        around = self.neighbours(r, c)
+        self.active -= 1
+        self.edges -= len(around)
+
+        # the old region is the cell plus whatever is reachable from its neighbours
+        old_cut = {move} & self.cut
+        new_cut = set()
+        seen = set()
+        pieces = 0
+        for cell in around:
+            if cell not in seen:
+                cut, cells = self.cut_cells(cell)
+                seen.update(cells)
+                new_cut |= cut
+                pieces += 1
+        old_cut |= seen & self.cut
+        self.cut -= old_cut
+        self.cut |= new_cut
+        self.regions += pieces - 1
+        self.hingers += (sum(1 for x, y in new_cut if grid[x][y] == 1)
+                         - sum(1 for x, y in old_cut if grid[x][y] == 1 or (x, y) == move))
+        self.history.append((move, (snapshot, old_cut, new_cut)))
+        return self.state
+
+    def undo(self):
+        """Reverts the most recent apply()."""
+        (r, c), change = self.history.pop()
+        self.state.grid[r][c] += 1
+        if not isinstance(change, tuple):
+            self.hingers -= change
+            return
+        snapshot, old_cut, new_cut = change
+        self.active, self.edges, self.regions, self.hingers = snapshot
+        self.cut -= new_cut
+        self.cut |= old_cut
+
+    def score(self):
+        """Same weighted sum as Agent.evaluate."""
+        total_move_cost = self.active + 2 * self.edges
+        return total_move_cost + 2 * self.regions - 3 * self.hingers
+
+
 class Agent:
-    def __init__(self, size, name='B1'):
+    def __init__(self, size, name='B1', book_path=None):
         self.size = size
         self.name = name
-        self.modes = ['minimax', 'alphabeta', 'mcts']
+        self.modes = ['minimax', 'alphabeta', 'mcts', 'rave']
+        self.book_path = book_path  # None for the default book, '' to disable
+        self.book = None
+        self.deadline = None  # time.monotonic() value while a search has a time_limit
 
     def __str__(self):
         return f"Agent name: {self.name}, Board size: {self.size}, Modes: {self.modes}"
 
    
-    def move(self, state, mode='mcts'):
+    def opening_book(self):
+        """Loads the opening book the first time it is needed."""
+        if self.book is None:
+            if self.book_path == '':
+                self.book = {}
+            else:
+                import a5_book
+                self.book = a5_book.load_book(self.book_path or a5_book.DEFAULT_BOOK)
+        return self.book
+
+    def book_move(self, state):
+        """Returns the opening book move for state, or None if it is not in the book."""
+        book = self.opening_book()
+        if not book:
+            return None
+        import a5_book
+        return book.get(a5_book.book_key(state.grid))
+
+    def move(self, state, mode='mcts', time_limit=None):
+        """
+        Returns the chosen (r, c) move, or None if state is terminal.
+        With time_limit (seconds), mcts/rave stop early with the best move so
+        far, and minimax/alphabeta raise TimeoutError if they cannot finish.
+        """
+        if mode not in self.modes:
+            raise ValueError(f"Unknown mode: {mode}")
         if self.is_terminal(state):
             return None
-        if mode == 'mcts':
-            return self.monte_carlo_tree_search(state, iterations=500)
-        elif mode == 'minimax':
-            _, move = self.minimax_move(state)
-            return move
-        elif mode == 'alphabeta':
-            _, move = self.alphabeta_move(state, float('-inf'), float('inf'))
+        move = self.book_move(state)
+        if move is not None:
             return move
-        else:
-            raise ValueError(f"Unknown mode: {mode}")
-
-    def is_terminal(self, state):
-        if self.win():
-            print("This state is in a winning position for the player whose turn is to move")
+        if mode == 'mcts':
+            return self.monte_carlo_tree_search(state, iterations=500, time_limit=time_limit)
+        elif mode == 'rave':
+            return self.monte_carlo_tree_search(state, iterations=500, rave=True,
+                                                time_limit=time_limit)
+        self.deadline = None if time_limit is None else time.monotonic() + time_limit
+        try:
+            if mode == 'minimax':
+                evaluator = IncrementalEvaluator(state)
+                _, move = self.minimax_move(evaluator.state, evaluator=evaluator)
+                return move
+            elif mode == 'alphabeta':
+                evaluator = IncrementalEvaluator(state)
+                _, move = self.alphabeta_move(evaluator.state, float('-inf'), float('inf'),
+                                              evaluator=evaluator)
+                return move
+            else:
+                raise ValueError(f"Unknown mode: {mode}")
+        finally:
+            self.deadline = None
+
+    def check_time(self):
+        """Raises TimeoutError once the deadline set by move() has passed."""
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise TimeoutError("move search ran out of time")
+
+    def is_terminal(self, state, evaluator=None):
+        if self.win(state, evaluator):
             return True
+        if evaluator is not None:
+            return evaluator.active == 0
         for row in state.grid:
             for cell in row:
                 if cell > 0: # found a move
                     return False
         return True # no moves found
 
-    def win(self, state):
+    def win(self, state, evaluator=None):
+        if evaluator is not None:
+            return evaluator.hingers > 0
         return state.numHingers() > 0
 
-    def evaluate(self,state):
+    def evaluate(self, state, evaluator=None):
+        if evaluator is not None:
+            return evaluator.score()
         total_move_cost = sum(state.move_cost(r, c)
                               for r in range(state.rows)
                               for c in range(state.cols)
@@ -61,15 +249,30 @@ class Agent:
         return score
 
    
-    def minimax_move(self, state, depth=3, max_player=True):
-        if depth == 0 or self.is_terminal(state):
-            return self.evaluate(state), None
+    def legal_moves(self, state):
+        """Active cells in the same row-major order as State.moves()."""
+        return [(r, c) for r in range(state.rows) for c in range(state.cols)
+                if state.grid[r][c] > 0]
+
+    def child(self, state, move, evaluator=None):
+        """The state after move; in place on the evaluator's state if there is one."""
+        if evaluator is not None:
+            return evaluator.apply(move)
+        return self.apply_move(state, move)
+
+    def minimax_move(self, state, depth=3, max_player=True, evaluator=None):
+        self.check_time()
+        if depth == 0 or self.is_terminal(state, evaluator):
+            return self.evaluate(state, evaluator), None
 
         if max_player:
             best_score = float('-inf')
             best_move = None
-            for new_state, move, cost in state.moves():
-                score, _ = self.minimax_move(new_state, depth-1, False)
+            for move in self.legal_moves(state):
+                new_state = self.child(state, move, evaluator)
+                score, _ = self.minimax_move(new_state, depth-1, False, evaluator)
+                if evaluator is not None:
+                    evaluator.undo()
                 if score > best_score:
                     best_score = score
                     best_move = move
@@ -77,24 +280,32 @@ class Agent:
         else:
             best_score = float('inf')
             best_move = None
-            for new_state, move, cost in state.moves():
-                score, _ = self.minimax_move(new_state, depth-1, True)
+            for move in self.legal_moves(state):
+                new_state = self.child(state, move, evaluator)
+                score, _ = self.minimax_move(new_state, depth-1, True, evaluator)
+                if evaluator is not None:
+                    evaluator.undo()
                 if score < best_score:
                     best_score = score
                     best_move = move
             return best_score, best_move
 
     
-    def alphabeta_move(self, state,alpha=float("-inf"), beta=float("inf"), depth=3, max_player=True):
+    def alphabeta_move(self, state,alpha=float("-inf"), beta=float("inf"), depth=3, max_player=True,
+                       evaluator=None):
+        self.check_time()
         #base case:
-        if depth == 0 or self.is_terminal(state):
-            return self.evaluate(state), None
+        if depth == 0 or self.is_terminal(state, evaluator):
+            return self.evaluate(state, evaluator), None
 
         if max_player:
             max_score = float('-inf')
             best_move = None
-            for new_state, move, cost in state.moves():
-                score, _ = self.alphabeta_move(new_state, alpha, beta, depth-1, False)
+            for move in self.legal_moves(state):
+                new_state = self.child(state, move, evaluator)
+                score, _ = self.alphabeta_move(new_state, alpha, beta, depth-1, False, evaluator)
+                if evaluator is not None:
+                    evaluator.undo()
                 if score > max_score:
                     max_score = score
                     best_move = move
@@ -105,8 +316,11 @@ class Agent:
         else:
             min_score = float('inf')
             best_move = None
-            for new_state, move, cost in state.moves():
-                score, _ = self.alphabeta_move(new_state, alpha, beta, depth-1, True)
+            for move in self.legal_moves(state):
+                new_state = self.child(state, move, evaluator)
+                score, _ = self.alphabeta_move(new_state, alpha, beta, depth-1, True, evaluator)
+                if evaluator is not None:
+                    evaluator.undo()
                 if score < min_score:
                     min_score = score
                     best_move = move
@@ -124,26 +338,48 @@ class Agent:
             self.children = []
             self.visits = 0
             self.wins = 0
+            self.amaf_visits = 0 # all-moves-as-first: playouts that played this move later on
+            self.amaf_wins = 0
             self.untried_moves = [move for _, move, _ in state.moves()]
             self.move = move
 
-    def monte_carlo_tree_search(self, state, iterations=500):
+    def monte_carlo_tree_search(self, state, iterations=500, rave=False, rave_k=300, time_limit=None):
+        """
+        Runs MCTS for the given iterations, stopping early once time_limit
+        seconds have passed if one is given (mid-playout if need be). With rave=True every playout also updates AMAF statistics
+        and selection blends them in (see rave_value). The number of iterations
+        run is left in self.iterations.
+        """
         root = self.Node(state)
-
-        for _ in range(iterations):
-            node = self.select(root)
-            child = self.expand(node)
-            result = self.simulate(child.state)
-            self.backpropagate(child, result)
+        if rave:
+            score = lambda node: self.rave_value(node, rave_k)
+        else:
+            score = self.uct
+        self.deadline = None if time_limit is None else time.monotonic() + time_limit
+
+        self.iterations = 0
+        try:
+            while self.iterations < iterations:
+                node = self.select(root, score)
+                child = self.expand(node)
+                played = [] if rave else None
+                result = self.simulate(child.state, played)
+                self.backpropagate(child, result, played)
+                self.iterations += 1
+        except TimeoutError:
+            pass  # the unfinished playout is dropped
+        finally:
+            self.deadline = None
 
         if not root.children:
             return None
         best_child = max(root.children, key=lambda n: n.visits)
         return best_child.move
 
-    def select(self, node):
+    def select(self, node, score=None):
+        score = score or self.uct
         while node.untried_moves == [] and node.children:
-            node = max(node.children, key=self.uct)
+            node = max(node.children, key=score)
         return node
 
     def expand(self, node):
@@ -156,20 +392,37 @@ class Agent:
         node.children.append(child_node)
         return child_node
 
-    def simulate(self, state):
+    def simulate(self, state, played=None):
+        """Random playout; appends each move to played if a list is given."""
         current_state = state.clone()
         while not self.is_terminal(current_state):
+            self.check_time()
             moves = [move for _, move, _ in current_state.moves()]
             if not moves:
                 break
             move = random.choice(moves)
+            if played is not None:
+                played.append(move)
             current_state = self.apply_move(current_state, move)
         return 1 if self.win(current_state) else 0
 
-    def backpropagate(self, node, result):
+    def backpropagate(self, node, result, played=None):
+        """
+        Updates the path back to the root. If played (the playout's moves) is
+        given, every child whose move was played later in the playout or
+        further down the tree also gets the result as AMAF statistics.
+        """
+        later = set(played) if played is not None else None
         while node:
             node.visits += 1
             node.wins += result
+            if later is not None:
+                for child in node.children:
+                    if child.move in later:
+                        child.amaf_visits += 1
+                        child.amaf_wins += result
+                if node.move is not None:
+                    later.add(node.move)
             node = node.parent
 
     def uct(self, node):
@@ -178,6 +431,20 @@ class Agent:
         parent_visits = node.parent.visits
         return (node.wins / node.visits) + math.sqrt(2 * math.log(parent_visits) / node.visits)
 
+    def rave_value(self, node, rave_k=300):
+        """
+        UCT with the exploitation term blended with the AMAF win rate.
+        beta = sqrt(k / (3n + k)) starts near 1 and fades as real visits n grow,
+        so AMAF guides early choices and plain UCT takes over later.
+        """
+        if node.visits == 0:
+            return float('inf')
+        win_rate = node.wins / node.visits
+        amaf_rate = node.amaf_wins / node.amaf_visits if node.amaf_visits else win_rate
+        beta = math.sqrt(rave_k / (3 * node.visits + rave_k))
+        exploration = math.sqrt(2 * math.log(node.parent.visits) / node.visits)
+        return (1 - beta) * win_rate + beta * amaf_rate + exploration
+
     def apply_move(self, state, move):
         new_state = state.clone()
         r, c = move
@@ -186,6 +453,42 @@ class Agent:
         return new_state
 
 
+def reference_scores(agent, state, depth=5):
+    """Alpha-beta score of every legal move, searching depth plies including the move."""
+    evaluator = IncrementalEvaluator(state)
+    scores = {}
+    for move in agent.legal_moves(evaluator.state):
+        child = agent.child(evaluator.state, move, evaluator)
+        scores[move], _ = agent.alphabeta_move(child, float('-inf'), float('inf'), depth - 1,
+                                               False, evaluator)
+        evaluator.undo()
+    return scores
+
+
+def compare_mcts(agent, state, time_limit=0.5, runs=5, depth=5):
+    """
+    Runs plain MCTS and RAVE for the same time budget and scores their moves
+    against a deep alpha-beta search: how often each picks a move with the
+    best reference score, and how much score its moves give up on average.
+    """
+    scores = reference_scores(agent, state, depth)
+    best = max(scores.values())
+    reference = sorted(move for move, score in scores.items() if score == best)
+    print(f"\nMCTS vs RAVE at {time_limit}s per move over {runs} runs, "
+          f"against depth {depth} alpha-beta (best moves: {reference}):")
+    for name, rave in (("UCT", False), ("RAVE", True)):
+        moves = []
+        iterations = 0
+        for _ in range(runs):
+            moves.append(agent.monte_carlo_tree_search(state, iterations=math.inf, rave=rave,
+                                                       time_limit=time_limit))
+            iterations += agent.iterations
+        agree = sum(move in reference for move in moves)
+        loss = sum(best - scores[move] for move in moves) / runs
+        print(f"{name:5} | avg iterations: {iterations / runs:.0f} | "
+              f"best move: {agree}/{runs} | avg score loss: {loss:.1f}")
+
+
 def tester():
     print("Agent state tester:")
     agent = Agent((4,5))
@@ -220,6 +523,24 @@ def tester():
     avg_time = timeit.timeit(run_alphabeta, number=10) / 10
     print(f"Average alphabeta time over 10 runs: {avg_time:.6f} seconds")
 
+    print("\nAlphabeta (depth 2) with full vs incremental evaluation on non-terminal boards:")
+    print("All cells 2: moves never empty a cell. All cells 1: every move empties one.")
+    for value in (2, 1):
+        for n in (3, 5, 7):
+            board = State([[value] * n for _ in range(n)])
+
+            def run_full():
+                agent.alphabeta_move(board, depth=2)
+
+            def run_incremental():
+                evaluator = IncrementalEvaluator(board)
+                agent.alphabeta_move(evaluator.state, depth=2, evaluator=evaluator)
+
+            full = timeit.timeit(run_full, number=3) / 3
+            incremental = timeit.timeit(run_incremental, number=3) / 3
+            print(f"{n}x{n} of {value}s | full: {full:.4f}s | incremental: {incremental:.4f}s | "
+                  f"speedup: {full / incremental:.1f}x")
+
 
     
 
@@ -235,5 +556,15 @@ def tester():
     move = agent.move(sa, 'alphabeta')
     print("Selected move:", move)
 
+    sb = State([
+        [1, 1, 0, 1, 2],
+        [1, 1, 1, 2, 2],
+        [0, 2, 1, 2, 2],
+        [1, 1, 1, 0, 2]
+    ])
+    print("\nAgent selects a move using RAVE:")
+    print("Selected move:", agent.move(sb, 'rave'))
+    compare_mcts(agent, sb)
+
 if __name__ == "__main__":
     tester()
@@ -0,0 +1,163 @@
+# a5_book
+"""
+Group ID: B1
+Student ID:
+100464246
+
+Opening book for the Hinger Game.
+Built offline by running a deep alpha-beta search from the standard start
+layouts and every position reachable within a few plies of them. Stored as
+a compact JSON file mapping grid keys to the best move, which Agent.move
+loads lazily and consults before searching.
+
+Run `python a5_book.py build` to regenerate opening_book.json; running it
+without arguments only tests the builder.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+from a1_state import State
+from a3_agent import Agent, IncrementalEvaluator
+
+DEFAULT_BOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opening_book.json')
+
+# Non-terminal start layouts: the a3 tester's RAVE board and the a2 path tester's start
+STANDARD_GRIDS = [
+    [
+        [1, 1, 0, 1, 2],
+        [1, 1, 1, 2, 2],
+        [0, 2, 1, 2, 2],
+        [1, 1, 1, 0, 2]
+    ],
+    [
+        [2, 2, 1, 1, 0],
+        [2, 2, 1, 1, 0],
+        [1, 1, 1, 2, 0]
+    ],
+]
+
+# The a1/a3/a4 tester and GUI layouts already contain a hinger, so Agent.move
+# returns None for them before it looks at the book; the book cannot help there.
+TERMINAL_GRIDS = [
+    [
+        [2, 1, 0, 0, 0],
+        [0, 1, 0, 1, 0],
+        [1, 0, 2, 0, 1],
+        [0, 0, 0, 1, 0]
+    ],
+    [
+        [1, 1, 0, 0, 1],
+        [1, 1, 0, 0, 0],
+        [0, 0, 1, 1, 1],
+        [0, 0, 0, 1, 1]
+    ],
+    [
+        [1, 1, 0, 0],
+        [0, 1, 0, 1],
+        [1, 0, 1, 0],
+        [0, 0, 0, 1]
+    ],
+]
+
+
+def book_key(grid):
+    """Compact string key for a grid, e.g. '1,1,0/0,1,0'."""
+    return '/'.join(','.join(str(cell) for cell in row) for row in grid)
+
+
+def build_book(grids, depth=5, plies=2):
+    """
+    Returns {book_key: (r, c)} with the best alpha-beta move (searched to depth)
+    for each start grid and every position reachable from it within plies moves.
+    Terminal positions are left out, since Agent.move returns None for them
+    before looking at the book, but the positions after them are still explored.
+    """
+    agent = Agent(size=None, name='book', book_path='')
+    book = {}
+    seen = set()
+    frontier = [State(grid) for grid in grids]
+    for _ in range(plies + 1):
+        next_frontier = []
+        for state in frontier:
+            key = book_key(state.grid)
+            if key in seen:
+                continue
+            seen.add(key)
+            if not agent.is_terminal(state):
+                evaluator = IncrementalEvaluator(state)
+                _, move = agent.alphabeta_move(evaluator.state, depth=depth, evaluator=evaluator)
+                if move is not None:
+                    book[key] = move
+            for new_state, _, _ in state.moves():
+                next_frontier.append(new_state)
+        frontier = next_frontier
+    return book
+
+
+def save_book(book, path=DEFAULT_BOOK, depth=None):
+    with open(path, 'w') as f:
+        json.dump({'depth': depth, 'positions': {key: list(move) for key, move in book.items()}},
+                  f, separators=(',', ':'), sort_keys=True)
+
+
+def load_book(path=DEFAULT_BOOK):
+    """Returns {book_key: (r, c)}, or an empty book if the file does not exist."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        data = json.load(f)
+    return {key: tuple(move) for key, move in data['positions'].items()}
+
+
+def regenerate(depth=5):
+    """Rebuilds the committed book at DEFAULT_BOOK from STANDARD_GRIDS."""
+    start = time.time()
+    book = build_book(STANDARD_GRIDS, depth=depth)
+    save_book(book, DEFAULT_BOOK, depth)
+    print(f"Saved {len(book)} positions at depth {depth} to {DEFAULT_BOOK} "
+          f"({os.path.getsize(DEFAULT_BOOK)} bytes) in {time.time() - start:.2f} seconds")
+
+
+def tester():
+    print("Opening book builder:")
+    depth = 3
+    start = time.time()
+    book = build_book(STANDARD_GRIDS, depth=depth, plies=1)
+    print(f"Built {len(book)} positions at depth {depth} in {time.time() - start:.2f} seconds")
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'book.json')
+        save_book(book, path, depth)
+        print(f"Saved to a temporary file ({os.path.getsize(path)} bytes)")
+        assert load_book(path) == book
+
+    state = State(STANDARD_GRIDS[0])
+    print("\nStandard start:")
+    print(state)
+
+    agent = Agent(state.rows)  # reads the committed book, never writes it
+    start = time.time()
+    agent.opening_book()
+    print(f"Loaded {len(agent.book)} positions in {time.time() - start:.6f} seconds")
+    start = time.time()
+    move = agent.move(state, 'alphabeta')
+    print(f"Agent.move with book: {move} in {time.time() - start:.6f} seconds")
+    assert move == agent.book[book_key(state.grid)]
+
+    no_book = Agent(state.rows, book_path='')
+    start = time.time()
+    move = no_book.move(state, 'alphabeta')
+    print(f"Depth-3 search without book: {move} in {time.time() - start:.6f} seconds")
+
+    for grid in TERMINAL_GRIDS:
+        assert agent.move(State(grid), 'alphabeta') is None  # terminal, book or not
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ['build']:
+        regenerate()
+    else:
+        tester()
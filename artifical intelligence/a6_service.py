@@ -0,0 +1,322 @@
+# a6_service
+"""
+Group ID: B1
+Student ID:
+100464246
+
+Asyncio move service for the Hinger Game.
+Listens on a local TCP socket for newline-delimited JSON requests and runs
+Agent.move / a2 path searches in a process pool.
+
+Requests:
+    {"id": 1, "type": "move", "grid": [[...]], "mode": "alphabeta", "timeout": 2.0}
+    {"id": 2, "type": "path", "start": [[...]], "end": [[...]], "algorithm": "astar", "timeout": 2.0}
+    {"id": 3, "type": "stats"}
+
+Identical in-flight requests share one search, finished results are kept in
+an LRU cache, and every request is answered within its timeout. Workers stop
+at the request's deadline, so a timed-out search frees its pool slot, and a
+search is started again if a new identical request has more time left than
+the running one.
+"""
+
+import asyncio
+import json
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from a1_state import State
+from a2_loader import path_module
+from a3_agent import Agent
+
+# A search stops this long before the client deadline so its result
+# can get back through the pool in time.
+WORKER_MARGIN = 0.02
+# A merged request only starts its own search if it has at least this
+# much more time than the running one.
+RESTART_MARGIN = 0.05
+
+"""
+
+Worker functions (run inside the process pool)
+
+"""
+_agent = None
+
+
+def run_move(grid, mode, deadline):
+    """Runs Agent.move until deadline, a time.time() value."""
+    global _agent
+    state = State(grid)
+    if _agent is None:
+        _agent = Agent(size=(state.rows, state.cols))  # keeps the opening book loaded
+    try:
+        move = _agent.move(state, mode, time_limit=max(0.0, deadline - time.time()))
+    except TimeoutError:
+        return {'status': 'timed_out', 'move': None}
+    return {'status': 'ok', 'move': list(move) if move else None}
+
+
+def run_path(start, end, algorithm, deadline):
+    """Runs a bounded a2 search; deadline is a time.time() value."""
+    paths = path_module()
+    searches = {
+        'bfs': paths.path_BFS,
+        'dfs': paths.path_DFS,
+        'iddfs': paths.path_IDDFS,
+        'astar': paths.path_astar,
+        'min_safe': paths.min_safe,
+    }
+    result = paths.bounded_search(searches[algorithm], State(start), State(end),
+                                  timeout=max(0.0, deadline - time.time()))
+    moves = result.path
+    if moves is not None and algorithm != 'min_safe':
+        moves = paths.path_moves(moves)
+    return {
+        'status': result.status,
+        'moves': [list(move) for move in moves] if moves is not None else None,
+        'expanded': result.expanded,
+    }
+
+
+"""
+
+Service
+
+"""
+def check_grid(grid, name='grid'):
+    """Raises ValueError unless grid is a non-empty rectangular list of lists of counts."""
+    if not isinstance(grid, list) or not grid or not all(isinstance(row, list) for row in grid):
+        raise ValueError(f"{name} must be a non-empty list of rows")
+    if not grid[0] or any(len(row) != len(grid[0]) for row in grid):
+        raise ValueError(f"{name} rows must be non-empty and all the same length")
+    if not all(isinstance(cell, int) and not isinstance(cell, bool) and 0 <= cell <= 255
+               for row in grid for cell in row):
+        raise ValueError(f"{name} cells must be integers from 0 to 255")
+
+
+
+class MoveService:
+    def __init__(self, host='127.0.0.1', port=0, workers=None, cache_size=1024,
+                 default_timeout=5.0):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.cache_size = cache_size
+        self.default_timeout = default_timeout
+        self.cache = OrderedDict()
+        self.in_flight = {}  # key -> (future, client deadline)
+        self.latencies = deque(maxlen=1000)
+        self.counts = {'requests': 0, 'cache_hits': 0, 'merged': 0, 'timeouts': 0, 'errors': 0}
+        self.pool = None
+        self.server = None
+        self.connections = {}  # handler task -> reader
+
+    async def start(self):
+        self.pool = ProcessPoolExecutor(self.workers)
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        """Stops accepting, lets open connections finish their requests, then stops the pool."""
+        self.server.close()
+        for reader in self.connections.values():
+            reader.feed_eof()
+        await asyncio.gather(*self.connections)
+        await self.server.wait_closed()
+        self.pool.shutdown(cancel_futures=True)
+
+    async def handle_client(self, reader, writer):
+        """Answers each line as soon as it is done, so one slow search does not block the rest."""
+        lock = asyncio.Lock()
+        tasks = set()
+
+        async def respond(line):
+            response = await self.handle(line)
+            async with lock:
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+
+        self.connections[asyncio.current_task()] = reader
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(respond(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            del self.connections[asyncio.current_task()]
+            writer.close()
+
+    async def handle(self, line):
+        started = time.monotonic()
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+            request_id = request.get('id')
+            if request.get('type') == 'stats':
+                return {'id': request_id, 'status': 'ok', 'stats': self.stats()}
+            self.counts['requests'] += 1
+            response = await self.dispatch(request)
+        except (ValueError, KeyError, TypeError) as error:
+            self.counts['errors'] += 1
+            response = {'status': 'error', 'error': str(error)}
+        except Exception as error:
+            # never leave a line unanswered
+            self.counts['errors'] += 1
+            response = {'status': 'error', 'error': f"{type(error).__name__}: {error}"}
+        elapsed = time.monotonic() - started
+        self.latencies.append(elapsed)
+        return dict(response, id=request_id, elapsed=elapsed)
+
+    async def dispatch(self, request):
+        kind = request['type']
+        timeout = float(request.get('timeout', self.default_timeout))
+        if kind == 'move':
+            mode = request.get('mode', 'alphabeta')
+            if mode not in ('minimax', 'alphabeta', 'mcts', 'rave'):
+                raise ValueError(f"Unknown mode: {mode}")
+            check_grid(request['grid'])
+            key = ('move', json.dumps(request['grid']), mode)
+            call = (run_move, request['grid'], mode)
+        elif kind == 'path':
+            algorithm = request.get('algorithm', 'astar')
+            if algorithm not in ('bfs', 'dfs', 'iddfs', 'astar', 'min_safe'):
+                raise ValueError(f"Unknown algorithm: {algorithm}")
+            check_grid(request['start'], 'start')
+            check_grid(request['end'], 'end')
+            if len(request['start']) != len(request['end']) or len(request['start'][0]) != len(request['end'][0]):
+                raise ValueError("start and end must have the same shape")
+            key = ('path', json.dumps(request['start']), json.dumps(request['end']), algorithm)
+            call = (run_path, request['start'], request['end'], algorithm)
+        else:
+            raise ValueError(f"Unknown request type: {kind}")
+        # the worker stops at its deadline, so an abandoned search does not hold a pool slot
+        deadline = time.time() + timeout
+        call += (deadline - min(WORKER_MARGIN, timeout / 2),)
+
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.counts['cache_hits'] += 1
+            return dict(self.cache[key], cached=True)
+
+        pool = self.pool
+        try:
+            running = self.in_flight.get(key)
+            if running is not None and running[1] + RESTART_MARGIN >= deadline:
+                self.counts['merged'] += 1
+                future = running[0]
+            else:
+                # nothing running, or the running search stops well before this deadline
+                future = asyncio.get_running_loop().run_in_executor(pool, *call)
+                self.in_flight[key] = (future, deadline)
+                future.add_done_callback(lambda done: self.finish(key, done))
+            result = await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self.counts['timeouts'] += 1
+            return {'status': 'timed_out'}
+        except Exception as error:
+            # anything raised submitting to or inside the worker, including a dead pool
+            self.counts['errors'] += 1
+            if isinstance(error, BrokenProcessPool) and pool is self.pool:
+                self.pool = ProcessPoolExecutor(self.workers)  # later requests get a working pool
+            return {'status': 'error', 'error': f"{type(error).__name__}: {error}"}
+        if result['status'] == 'timed_out':
+            self.counts['timeouts'] += 1  # the worker hit its deadline first
+        return dict(result, cached=False)
+
+    def finish(self, key, future):
+        """Moves a finished search from in_flight into the cache."""
+        if key in self.in_flight and self.in_flight[key][0] is future:
+            del self.in_flight[key]
+        if future.cancelled() or future.exception() is not None:
+            return
+        result = future.result()
+        if result['status'] in ('timed_out', 'cancelled'):
+            return
+        self.cache[key] = result
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        return dict(self.counts,
+                    queue_depth=len(self.in_flight),
+                    cache_size=len(self.cache),
+                    latency_p50=percentile(0.50),
+                    latency_p95=percentile(0.95),
+                    latency_p99=percentile(0.99))
+
+
+async def request(port, payloads, host='127.0.0.1'):
+    """Sends payloads over one connection and returns the responses ordered by id."""
+    reader, writer = await asyncio.open_connection(host, port)
+    for payload in payloads:
+        writer.write(json.dumps(payload).encode() + b'\n')
+    await writer.drain()
+    responses = [json.loads(await reader.readline()) for _ in payloads]
+    writer.close()
+    await writer.wait_closed()
+    return sorted(responses, key=lambda response: str(response['id']))
+
+
+def tester():
+    print("Move service tester:")
+    grid = [
+        [1, 1, 0, 0, 1],
+        [1, 1, 0, 0, 0],
+        [0, 0, 1, 1, 1],
+        [0, 0, 0, 1, 1]
+    ]
+    start = [[2, 2, 1, 0], [2, 2, 1, 0], [1, 1, 1, 0]]
+    end = [[1, 1, 1, 0], [1, 1, 1, 0], [1, 1, 1, 0]]
+
+    async def run():
+        service = await MoveService(workers=4).start()
+        print(f"Listening on 127.0.0.1:{service.port}")
+        clients = []
+        for i in range(8):
+            clients.append(request(service.port, [
+                {'id': f'{i}-move', 'type': 'move', 'grid': grid, 'mode': 'alphabeta'},
+                {'id': f'{i}-path', 'type': 'path', 'start': start, 'end': end,
+                 'algorithm': 'astar', 'timeout': 2.0},
+                {'id': f'{i}-slow', 'type': 'path', 'start': start, 'end': end,
+                 'algorithm': 'min_safe', 'timeout': 0.01},
+            ]))
+        for responses in await asyncio.gather(*clients):
+            for response in responses:
+                print(response)
+        again = await request(service.port, [{'id': 'again', 'type': 'move', 'grid': grid}])
+        print(again[0])
+        print("\nSame search with a short and a long timeout, a ragged grid and a non-object:")
+        big_start = [[2] * 6 for _ in range(6)]
+        big_end = [[1] * 6 for _ in range(6)]
+        for response in await request(service.port, [
+            {'id': 'short', 'type': 'path', 'start': big_start, 'end': big_end,
+             'algorithm': 'min_safe', 'timeout': 0.05},
+            {'id': 'long', 'type': 'path', 'start': big_start, 'end': big_end,
+             'algorithm': 'min_safe', 'timeout': 0.5},
+            {'id': 'ragged', 'type': 'move', 'grid': [[1, 1], [1]]},
+            [1, 2],
+        ]):
+            print(response)
+        stats = await request(service.port, [{'id': 'stats', 'type': 'stats'}])
+        print(stats[0]['stats'])
+        await service.close()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    tester()
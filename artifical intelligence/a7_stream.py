@@ -0,0 +1,210 @@
+# a7_stream
+"""
+Group ID: B1
+Student ID:
+100464246
+
+Streaming analysis for very large Hinger boards.
+A board file holds one byte (the number of counters) per cell in row-major
+order. It is memory-mapped and read row by row, so memory stays proportional
+to the board width rather than its area.
+"""
+
+import mmap
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from a1_state import State
+
+# Neighbours of a cell in ring order around it
+RING = [(-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1)]
+
+
+def write_board(path, grid):
+    """Writes a 2D list to a board file, one byte per cell."""
+    with open(path, 'wb') as f:
+        for row in grid:
+            f.write(bytes(row))
+
+
+class BoardFile:
+    """A memory-mapped board file with a known width."""
+    def __init__(self, path, width):
+        self.path = path
+        self.width = width
+        size = os.path.getsize(path)
+        assert size % width == 0, "file size must be a multiple of the width"
+        self.height = size // width
+
+    def rows(self):
+        """Yields each row as bytes."""
+        if self.height == 0:
+            return
+        with open(self.path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for r in range(self.height):
+                    yield data[r * self.width:(r + 1) * self.width]
+
+
+def count_regions(board):
+    """
+    Counts active regions with a two-row union-find sweep.
+    Labels from the previous row are unioned with the current row; a label
+    that does not reach the current row belongs to a finished region.
+    Labels are renumbered every row, so at most 2 * width are alive.
+    """
+    width = board.width
+    regions = 0
+    prev = [-1] * width  # compact label of each cell in the previous row
+    prev_count = 0
+
+    for row in board.rows():
+        parent = list(range(prev_count))
+
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        def union(a, b):
+            a, b = find(a), find(b)
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+
+        labels = [-1] * width
+        for c in range(width):
+            if row[c] == 0:
+                continue
+            label = len(parent)
+            parent.append(label)
+            labels[c] = label
+            if c > 0 and labels[c - 1] >= 0:
+                union(label, labels[c - 1])
+            for dc in (-1, 0, 1):
+                if 0 <= c + dc < width and prev[c + dc] >= 0:
+                    union(label, prev[c + dc])
+
+        live = {find(label) for label in labels if label >= 0}
+        regions += len({find(label) for label in range(prev_count)} - live)
+
+        # renumber the current row's roots as 0..n-1 for the next row
+        compact = {}
+        for c in range(width):
+            if labels[c] >= 0:
+                labels[c] = compact.setdefault(find(labels[c]), len(compact))
+        prev, prev_count = labels, len(compact)
+
+    return regions + prev_count
+
+
+def ring_groups(mask):
+    """
+    Number of groups the active ring cells in mask (bit i = RING[i]) form
+    when joined only to each other.
+    """
+    ring = [RING[i] for i in range(8) if mask >> i & 1]
+    groups = 0
+    seen = set()
+    for cell in ring:
+        if cell in seen:
+            continue
+        groups += 1
+        stack = [cell]
+        seen.add(cell)
+        while stack:
+            r1, c1 = stack.pop()
+            for other in ring:
+                if other not in seen and abs(other[0] - r1) <= 1 and abs(other[1] - c1) <= 1:
+                    seen.add(other)
+                    stack.append(other)
+    return groups
+
+
+# LOCAL_CUT[mask] is True if removing the centre splits the ring cells in mask
+LOCAL_CUT = [ring_groups(mask) >= 2 for mask in range(256)]
+
+
+def is_local_cut(above, row, below, c, width):
+    """
+    True if removing cell c leaves its active neighbours in two or more
+    groups when only the 3x3 block around it is considered.
+    """
+    window = (above, row, below)
+    mask = 0
+    for i, (dr, dc) in enumerate(RING):
+        line = window[dr + 1]
+        if line is not None and 0 <= c + dc < width and line[c + dc] > 0:
+            mask |= 1 << i
+    return LOCAL_CUT[mask]
+
+
+def hinger_candidates(board):
+    """
+    Yields (r, c) for every single-counter cell that is a local cut, using a
+    three-row window. Every hinger is a candidate; a candidate whose
+    neighbours are joined further away is not a hinger, so check candidates
+    against the full board when it fits in memory.
+    """
+    width = board.width
+    above, row = None, None
+    r = -1
+    for below in board.rows():
+        if row is not None:
+            for c in range(width):
+                if row[c] == 1 and is_local_cut(above, row, below, c, width):
+                    yield (r, c)
+        above, row = row, below
+        r += 1
+    if row is not None:
+        for c in range(width):
+            if row[c] == 1 and is_local_cut(above, row, None, c, width):
+                yield (r, c)
+
+
+def tester():
+    print("Streaming analysis tester:")
+    random.seed(0)
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'stream_test.board')
+        for trial in range(200):
+            rows, cols = random.randint(1, 8), random.randint(1, 8)
+            grid = [[random.choice([0, 0, 1, 1, 2]) for _ in range(cols)] for _ in range(rows)]
+            write_board(path, grid)
+            board = BoardFile(path, cols)
+            state = State(grid)
+            assert count_regions(board) == state.numRegions()
+            candidates = set(hinger_candidates(board))
+            for r in range(rows):
+                for c in range(cols):
+                    if grid[r][c] == 1:
+                        split = state.clone()
+                        split.grid[r][c] = 0
+                        if split.numRegions() > state.numRegions():
+                            assert (r, c) in candidates
+        print("Small boards agree with State.numRegions and numHingers")
+
+        width, height = 1000, 1000
+        with open(path, 'wb') as f:
+            for _ in range(height):
+                f.write(bytes(random.choice((0, 0, 1, 2)) for _ in range(width)))
+        board = BoardFile(path, width)
+        start = time.time()
+        regions = count_regions(board)
+        candidates = sum(1 for _ in hinger_candidates(board))
+        print(f"{width}x{height} board: {regions} regions, {candidates} hinger candidates "
+              f"in {time.time() - start:.2f} seconds")
+
+        tracemalloc.start()
+        count_regions(board)
+        sum(1 for _ in hinger_candidates(board))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"Peak memory: {peak / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    tester()
@@ -0,0 +1,290 @@
+# a8_parallel
+"""
+Group ID: B1
+Student ID:
+100464246
+
+Multi-core BFS and Dijkstra (min_safe) path searches.
+Almost all of a sequential search's time goes on is_safe, which counts the
+hingers of every child state. These searches expand a whole BFS layer, or
+every node of the lowest Dijkstra cost, at once: successors and the
+visited / g-score tables stay in the parent (cheap tuple operations), and
+only the new child keys are sent to a process pool in chunks for is_safe.
+Results are merged in a fixed order, so they are deterministic and match
+the sequential searches in length and cost.
+"""
+
+import heapq
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import count
+from a1_state import State, region_hingers
+from a2_loader import path_module
+
+"""
+
+Worker function (runs inside the process pool)
+
+"""
+def safe_keys(keys):
+    """Returns the subset of grid keys whose states have no hingers."""
+    is_safe = path_module().is_safe
+    return [key for key in keys if is_safe(State([list(row) for row in key]))]
+
+
+"""
+
+Parallel expansion
+
+"""
+def successors(key):
+    """Returns [(child_key, (r, c), move_cost)] for a grid key, in State.moves() order."""
+    rows, cols = len(key), len(key[0])
+    children = []
+    for r in range(rows):
+        for c in range(cols):
+            if key[r][c] > 0:
+                cost = 1
+                for nr in range(max(r - 1, 0), min(r + 2, rows)):
+                    for nc in range(max(c - 1, 0), min(c + 2, cols)):
+                        if (nr, nc) != (r, c) and key[nr][nc] > 0:
+                            cost += 1
+                row = key[r][:c] + (key[r][c] - 1,) + key[r][c+1:]
+                children.append((key[:r] + (row,) + key[r+1:], (r, c), cost))
+    return children
+
+
+class KeyGrid:
+    """A grid key standing in for a State in SearchBudget.expand, which only reads .grid."""
+    __slots__ = ('grid',)
+
+    def __init__(self, key):
+        self.grid = key
+
+
+class SafetyPool:
+    """
+    Splits a batch of child keys into chunks and runs safe_keys on them in a
+    pool, at most chunk_size keys per task and at least one task per worker.
+    Batches smaller than min_batch are checked in this process, since
+    sending them would cost more than checking them.
+    """
+    def __init__(self, pool, workers, chunk_size=64, min_batch=16):
+        self.pool = pool
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.min_batch = min_batch
+
+    def safe(self, keys, budget=None):
+        """
+        Returns the set of keys whose states are safe. With a budget, the
+        clock and token are checked after every key checked here or every
+        chunk back from the pool, and waiting stops at the budget's deadline.
+        """
+        if len(keys) < self.min_batch:
+            if budget is None:
+                return set(safe_keys(keys))
+            safe = set()
+            for key in keys:
+                budget.check()
+                safe.update(safe_keys([key]))
+            return safe
+        size = min(self.chunk_size, math.ceil(len(keys) / self.workers))
+        futures = [self.pool.submit(safe_keys, keys[i:i + size]) for i in range(0, len(keys), size)]
+        timeout = None
+        if budget is not None and budget.deadline is not None:
+            timeout = max(0.0, budget.deadline - time.monotonic())
+        safe = set()
+        try:
+            for future in as_completed(futures, timeout):
+                safe.update(future.result())
+                if budget is not None:
+                    budget.check()
+        except TimeoutError:
+            paths = path_module()
+            raise paths.SearchStopped(paths.TIMED_OUT)
+        finally:
+            for future in futures:
+                future.cancel()  # chunks already running in a worker still finish there
+        return safe
+
+
+def parallel_BFS(start, end, pool=None, workers=None, budget=None):
+    """
+    Layer-by-layer BFS over safe states using a process pool.
+    workers sets the pool size when no pool is given, and how many tasks a
+    layer's safety checks are split into.
+    Returns the same path as path_BFS (a list of States) or None.
+    """
+    paths = path_module()
+    workers = workers or os.cpu_count()
+    if pool is None:
+        with ProcessPoolExecutor(workers) as own_pool:
+            return parallel_BFS(start, end, own_pool, workers, budget)
+    if not paths.is_safe(start) or not paths.is_safe(end):
+        return None
+    if paths.states_equal(start, end):
+        return [start]
+
+    checker = SafetyPool(pool, workers)
+    start_key = paths.grid_to_key(start.grid)
+    end_key = paths.grid_to_key(end.grid)
+    parents = {start_key: None}  # safe key -> parent key
+    unsafe = set()
+    layer = [start_key]
+
+    def path_to(key):
+        keys = []
+        while key is not None:
+            keys.append(key)
+            key = parents[key]
+        return [State([list(row) for row in key]) for key in reversed(keys)]
+
+    while layer:
+        if budget is not None:
+            for key in layer:
+                budget.expand(KeyGrid(key), end, lambda: path_to(key))
+        children = [successors(key) for key in layer]
+        new_keys = list(dict.fromkeys(child_key for kids in children for child_key, _, _ in kids
+                                      if child_key not in parents and child_key not in unsafe))
+        safe = checker.safe(new_keys, budget)
+        unsafe.update(key for key in new_keys if key not in safe)
+        next_layer = []
+        for parent, kids in zip(layer, children):
+            for child_key, _, _ in kids:
+                if child_key in safe and child_key not in parents:
+                    parents[child_key] = parent
+                    if child_key == end_key:
+                        return path_to(child_key)
+                    next_layer.append(child_key)
+        layer = next_layer
+    return None
+
+
+def parallel_min_safe(start, end, pool=None, workers=None, budget=None):
+    """
+    Dijkstra over safe states, expanding every node of the lowest cost at
+    once and checking their children's safety in a process pool. Returns a
+    minimal-cost list of (r, c) moves like min_safe, or None.
+    """
+    paths = path_module()
+    workers = workers or os.cpu_count()
+    if pool is None:
+        with ProcessPoolExecutor(workers) as own_pool:
+            return parallel_min_safe(start, end, own_pool, workers, budget)
+    if not paths.is_safe(start) or not paths.is_safe(end):
+        return None
+    if paths.states_equal(start, end):
+        return []
+
+    checker = SafetyPool(pool, workers)
+    start_key = paths.grid_to_key(start.grid)
+    end_key = paths.grid_to_key(end.grid)
+    best = {start_key: (0, None, None)}  # safe key -> (g, parent key, move)
+    closed = set()
+    unsafe = set()
+    tie = count()
+    heap = [(0, next(tie), start_key)]
+
+    def moves_to(key):
+        moves = []
+        while True:
+            _, parent, move = best[key]
+            if parent is None:
+                return moves[::-1]
+            moves.append(move)
+            key = parent
+
+    while heap:
+        # pop every live node with the lowest cost; move costs are >= 1 so all are final
+        cost = heap[0][0]
+        batch = []
+        while heap and heap[0][0] == cost:
+            _, _, key = heapq.heappop(heap)
+            if key not in closed and best[key][0] == cost:
+                closed.add(key)
+                batch.append(key)
+        if not batch:
+            continue
+        if end_key in closed:
+            return moves_to(end_key)
+        if budget is not None:
+            for key in batch:
+                budget.expand(KeyGrid(key), end, lambda: moves_to(key))
+
+        children = [successors(key) for key in batch]
+        new_keys = list(dict.fromkeys(child_key for kids in children for child_key, _, _ in kids
+                                      if child_key not in best and child_key not in unsafe))
+        safe = checker.safe(new_keys, budget)
+        unsafe.update(key for key in new_keys if key not in safe)
+        for parent, kids in zip(batch, children):
+            for child_key, move, move_cost in kids:
+                if child_key in closed or child_key in unsafe:
+                    continue
+                g = cost + move_cost
+                if child_key not in best or g < best[child_key][0]:
+                    best[child_key] = (g, parent, move)
+                    heapq.heappush(heap, (g, next(tie), child_key))
+    return None
+
+
+def tester():
+    print("Parallel path search tester:")
+    paths = path_module()
+    start = State([
+        [2, 2, 1, 1, 0],
+        [2, 2, 1, 1, 0],
+        [1, 1, 1, 2, 0],
+    ])
+    end = State([
+        [1, 1, 1, 1, 0],
+        [1, 1, 1, 1, 0],
+        [1, 1, 1, 1, 0],
+    ])
+
+    def total_cost(moves):
+        state = start.clone()
+        total = 0
+        for r, c in moves:
+            total += state.move_cost(r, c)
+            state.grid[r][c] -= 1
+        return total
+
+    def report(name, result, elapsed):
+        if result and isinstance(result[0], State):
+            print(f"{name:16} | Path length: {len(result)} | Total cost: {paths.path_cost(result)} "
+                  f"| {elapsed:.2f} seconds")
+        else:
+            print(f"{name:16} | Moves: {len(result)} | Total cost: {total_cost(result)} "
+                  f"| {elapsed:.2f} seconds")
+
+    print(f"Benchmark on {os.cpu_count()} CPU(s); every run starts with cold hinger caches:")
+    for name, func in [("BFS", paths.path_BFS), ("min_safe", paths.min_safe)]:
+        region_hingers.cache_clear()
+        begin = time.time()
+        result = func(start, end)
+        report(f"{name} seq", result, time.time() - begin)
+    for workers in (1, 2, 4):
+        for name, func in [("BFS", parallel_BFS), ("min_safe", parallel_min_safe)]:
+            # a fresh pool per run, so no worker keeps its cache from an earlier search
+            with ProcessPoolExecutor(workers) as pool:
+                list(pool.map(safe_keys, [[]] * workers))  # start the workers before timing
+                region_hingers.cache_clear()  # small batches are checked in this process
+                begin = time.time()
+                result = func(start, end, pool, workers)
+                report(f"{name} par x{workers}", result, time.time() - begin)
+
+    print("\nBounded parallel search:")
+    with ProcessPoolExecutor() as pool:
+        region_hingers.cache_clear()
+        for timeout in (0.05, 0.5):
+            begin = time.time()
+            result = paths.bounded_search(parallel_min_safe, start, end, timeout=timeout, pool=pool)
+            print(f"timeout {timeout}s | {result.status} after {time.time() - begin:.3f} seconds, "
+                  f"{result.expanded} expanded")
+
+
+if __name__ == "__main__":
+    tester()